@@ -0,0 +1,29 @@
+-- Indexes for the API's date-ranged and "latest N" queries on drives and
+-- charging_processes. The tool never sends car_id, so these queries filter
+-- and sort on start_date alone; start_date is therefore the key, and car_id
+-- is an INCLUDE column so a car_id filter can still be checked in the index.
+--
+-- INCLUDE covers every column recent-drives, drives-by-date, the driving
+-- journal, efficiency and charging-stats read, so once autovacuum has marked
+-- the pages all-visible they are answered with index-only scans.
+-- drive-stats also reads power and inside-temperature columns and still
+-- visits the table.
+--
+-- An earlier version of this file created (car_id, start_date) indexes that
+-- could not serve those queries; they are dropped here.
+--
+-- CONCURRENTLY avoids locking TeslaMate's writes; run this file with psql
+-- outside a transaction block (the default for `psql -f`).
+
+DROP INDEX CONCURRENTLY IF EXISTS idx_drives_car_start;
+DROP INDEX CONCURRENTLY IF EXISTS idx_cp_car_start;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_drives_start
+    ON drives (start_date DESC)
+    INCLUDE (car_id, end_date, distance, duration_min, start_address_id, end_address_id,
+             start_ideal_range_km, end_ideal_range_km, outside_temp_avg, speed_max);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_cp_start
+    ON charging_processes (start_date)
+    INCLUDE (car_id, charge_energy_added, charge_energy_used, duration_min, cost,
+             outside_temp_avg);
@@ -0,0 +1,22 @@
+-- Index for the API's lookups on positions, TeslaMate's largest table.
+--
+-- The tool never sends car_id, so the "latest reading" queries
+-- (battery-status, tire-pressure, temperature, the odometer lookup) reduce
+-- to ORDER BY date DESC LIMIT 1 over all cars. A plain btree on date answers
+-- them by reading from the newest end of the index instead of sorting the
+-- table. The same index serves the date-ranged temperature aggregates. It is
+-- kept to the single key column because positions takes a row every few
+-- seconds while driving, and every index adds to that write cost.
+--
+-- An earlier version of this file created a wide (car_id, date) index that
+-- could not serve those queries, plus a BRIN index on date that this btree
+-- makes redundant; both are dropped here.
+--
+-- CONCURRENTLY avoids locking TeslaMate's writes; run this file with psql
+-- outside a transaction block (the default for `psql -f`).
+
+DROP INDEX CONCURRENTLY IF EXISTS idx_positions_car_date;
+DROP INDEX CONCURRENTLY IF EXISTS idx_positions_date_brin;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_positions_date
+    ON positions (date DESC);
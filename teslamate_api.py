@@ -1,13 +1,184 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, ORJSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware
 import psycopg2
 from psycopg2.extras import RealDictCursor
+from psycopg2.errors import QueryCanceled
+from psycopg2.pool import ThreadedConnectionPool
 from datetime import datetime, timedelta, date
-from typing import Optional
-import os, math, random
-
-app = FastAPI(title="TeslaMate Chat API")
-
+from decimal import Decimal
+from typing import Any, Optional
+import os, math, random, time, asyncio, logging, threading
+import orjson
+
+# Return numeric columns (temperatures, ranges, kWh, AVG/SUM results) as
+# floats straight from the C parser instead of Decimals that every handler
+# would otherwise have to convert.
+DEC2FLOAT = psycopg2.extensions.new_type(
+    psycopg2.extensions.DECIMAL.values, "DEC2FLOAT",
+    lambda value, cur: float(value) if value is not None else None)
+psycopg2.extensions.register_type(DEC2FLOAT)
+
+def _json_default(obj):
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError
+
+class FastJSONResponse(ORJSONResponse):
+    """orjson-encoded response that also handles Decimals (numeric arrays are not covered by DEC2FLOAT)."""
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_json_default)
+
+app = FastAPI(title="TeslaMate Chat API", default_response_class=FastJSONResponse)
+log = logging.getLogger("uvicorn.error")
+
+WEEKDAYS_SV = ("Mandag", "Tisdag", "Onsdag", "Torsdag", "Fredag", "Lordag", "Sondag")
+# Journal extra distance: (day km above, min extra km, max extra km), cumulative.
+JOURNAL_EXTRA_KM = ((0, 2, 5), (80, 3, 7), (150, 4, 8), (300, 5, 12))
+KM_TO_MI = 1 / 1.60934
+# Efficiency estimate: kWh per km of ideal range, assuming a 75 kWh pack
+# rated for 400 km.
+KWH_PER_RANGE_KM = 75 / 400
+
+def _since(**delta):
+    """Start of a look-back window, truncated to the minute so requests within
+    the same minute (and the same cache TTL) query an identical window."""
+    return datetime.now().replace(second=0, microsecond=0) - timedelta(**delta)
+
+DB_SETTINGS = dict(
+    host=os.getenv("DATABASE_HOST", "database"),
+    port=int(os.getenv("DATABASE_PORT", "5432")),
+    database=os.getenv("DATABASE_NAME", "teslamate"),
+    user=os.getenv("DATABASE_USER", "teslamate"),
+    password=os.getenv("DATABASE_PASS", "secret"),
+    connect_timeout=5,
+    cursor_factory=RealDictCursor
+)
+# Server-side cap on query time so one runaway query can't hold a pool slot.
+STATEMENT_TIMEOUT_MS = int(os.getenv("DATABASE_STATEMENT_TIMEOUT_MS", "10000"))
+if STATEMENT_TIMEOUT_MS > 0:
+    DB_SETTINGS["options"] = f"-c statement_timeout={STATEMENT_TIMEOUT_MS}"
+POOL_MIN = int(os.getenv("DATABASE_POOL_MIN", "5"))
+POOL_MAX = int(os.getenv("DATABASE_POOL_MAX", "20"))
+
+# ThreadedConnectionPool raises instead of waiting when all connections are
+# checked out, so requests queue on this semaphore first. Waiting happens on
+# the event loop, so a queued request never ties up a threadpool worker that
+# a request already holding a connection needs to run its handler.
+_pool_slots = asyncio.Semaphore(POOL_MAX)
+_pool_lock = threading.Lock()
+_pool = None
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadedConnectionPool(POOL_MIN, POOL_MAX, **DB_SETTINGS)
+    return _pool
+
+def _ping(conn):
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute("SELECT 1")
+
+def _checkout():
+    """Take a pooled connection, replacing it once if the server has dropped it."""
+    pool = get_pool()
+    for retry in (True, False):
+        conn = pool.getconn()
+        try:
+            _ping(conn)
+            return conn
+        except psycopg2.OperationalError:
+            pool.putconn(conn, close=True)
+            if not retry:
+                raise
+
+def _http_error(e):
+    if isinstance(e, QueryCanceled):
+        return HTTPException(status_code=504, detail="Database query timed out")
+    return HTTPException(status_code=500, detail=str(e))
+
+async def get_conn():
+    async with _pool_slots:
+        try:
+            conn = await run_in_threadpool(_checkout)
+        except Exception as e:
+            raise HTTPException(status_code=503, detail=f"Database error: {str(e)}")
+        try:
+            yield conn
+        finally:
+            get_pool().putconn(conn, close=bool(conn.closed))
+
+@app.on_event("startup")
+def warm_pool():
+    """Create the pool at startup so its POOL_MIN connections are already open
+    when the first requests arrive. ThreadedConnectionPool opens them one after
+    another in its constructor."""
+    try:
+        get_pool()
+    except Exception as e:
+        log.warning("Connection pool warmup failed: %s", e)
+
+@app.on_event("shutdown")
+def close_pool():
+    if _pool is not None:
+        _pool.closeall()
+
+# Seconds a response stays fresh, per path. Expired entries are kept for
+# CACHE_STALE_FOR more seconds and served if the database is unavailable.
+CACHE_TTL = {
+    "/api/battery-status": 10,
+    "/api/car-state": 10,
+    "/api/recent-drives": 30,
+    "/api/temperature": 60,
+    "/api/tire-pressure": 60,
+    "/api/charging-stats": 60,
+    "/api/efficiency": 60,
+    "/api/total-distance": 60,
+    "/api/drives-by-date": 120,
+    "/api/driving-journal": 120,
+    "/api/drive-stats": 300,
+    "/api/cars": 300,
+    "/api/battery-health": 600,
+}
+CACHE_STALE_FOR = 3600
+CACHE_MAX_ENTRIES = 256
+_response_cache = {}
+# Per-process counts of X-Cache outcomes, reported by /api/health.
+_cache_stats = {"HIT": 0, "MISS": 0, "STALE": 0}
+
+def _cached_response(body, status):
+    _cache_stats[status] += 1
+    return Response(content=body, media_type="application/json", headers={"X-Cache": status})
+
+async def cache_responses(request, call_next):
+    ttl = CACHE_TTL.get(request.url.path)
+    if not ttl or request.method != "GET":
+        return await call_next(request)
+    key = (request.url.path, tuple(sorted(request.query_params.multi_items())))
+    now = time.monotonic()
+    entry = _response_cache.get(key)
+    if entry and entry[0] > now:
+        return _cached_response(entry[1], "HIT")
+    response = await call_next(request)
+    if response.status_code >= 500 and entry and entry[0] + CACHE_STALE_FOR > now:
+        return _cached_response(entry[1], "STALE")
+    if response.status_code != 200:
+        return response
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    _response_cache.pop(key, None)
+    if len(_response_cache) >= CACHE_MAX_ENTRIES:
+        _response_cache.pop(next(iter(_response_cache)))
+    _response_cache[key] = (now + ttl, body)
+    return _cached_response(body, "MISS")
+
+# Added after the cache so CORS wraps it and cached hits still get CORS headers.
+app.add_middleware(BaseHTTPMiddleware, dispatch=cache_responses)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -15,160 +186,173 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-
-def get_db_connection():
-    return psycopg2.connect(
-        host=os.getenv("DATABASE_HOST", "database"),
-        database=os.getenv("DATABASE_NAME", "teslamate"),
-        user=os.getenv("DATABASE_USER", "teslamate"),
-        password=os.getenv("DATABASE_PASS", "secret"),
-        cursor_factory=RealDictCursor
-    )
+# Outermost, so cached bodies are stored uncompressed and compressed per client.
+app.add_middleware(GZipMiddleware, minimum_size=1024)
 
 @app.get("/")
 def root():
     return {"status": "TeslaMate Chat API Running", "version": "3.0"}
 
 @app.get("/api/health")
-def health_check():
-    try:
-        conn = get_db_connection()
-        conn.close()
-        return {"status": "healthy", "database": "connected"}
-    except Exception as e:
-        raise HTTPException(status_code=503, detail=f"Database error: {str(e)}")
+def health_check(conn: Any = Depends(get_conn)):
+    # get_conn has already pinged the pooled connection (reconnecting once if
+    # it was dropped) and answers 503 when the database is unreachable.
+    return {"status": "healthy", "database": "connected", "cache": _cache_stats}
+
+SQL_CARS = """
+    SELECT id, vin, model, marketing_name, trim_badging, name,
+           efficiency, exterior_color, wheel_type,
+           inserted_at, updated_at
+    FROM cars ORDER BY id
+"""
+# The cars table only changes when a vehicle is added, so handlers that embed
+# car info (e.g. the dashboard) share one snapshot per process.
+CARS_TTL = 300
+_cars_snapshot = (0.0, None)
+
+def _load_cars(conn):
+    global _cars_snapshot
+    expires, cars = _cars_snapshot
+    if cars is None or expires <= time.monotonic():
+        cur = conn.cursor()
+        cur.execute(SQL_CARS)
+        cars = cur.fetchall()
+        _cars_snapshot = (time.monotonic() + CARS_TTL, cars)
+    return cars
 
 @app.get("/api/cars")
-def get_cars():
+def get_cars(conn: Any = Depends(get_conn)):
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT id, vin, model, marketing_name, trim_badging, name,
-                   efficiency, exterior_color, wheel_type,
-                   inserted_at, updated_at
-            FROM cars ORDER BY id
-        """)
-        cars = cur.fetchall()
-        conn.close()
-        return {"cars": cars}
+        return {"cars": _load_cars(conn)}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _http_error(e)
+
+SQL_LATEST_ODOMETER = "SELECT odometer FROM positions WHERE (%(car_id)s::int IS NULL OR car_id = %(car_id)s) ORDER BY date DESC LIMIT 1"
+SQL_TOTAL_DISTANCE = f"""
+    SELECT SUM(distance) as total_km, COUNT(*) as total_trips,
+           ({SQL_LATEST_ODOMETER}) as odometer
+    FROM drives WHERE (%(car_id)s::int IS NULL OR car_id = %(car_id)s)
+"""
 
 @app.get("/api/total-distance")
-def get_total_distance(car_id: Optional[int] = None, unit: str = "km"):
+def get_total_distance(car_id: Optional[int] = None, unit: str = "km", conn: Any = Depends(get_conn)):
     try:
-        conn = get_db_connection()
         cur = conn.cursor()
-        where_clause = f"WHERE car_id = {car_id}" if car_id else ""
-        cur.execute(f"SELECT SUM(distance) as total_km, COUNT(*) as total_trips FROM drives {where_clause}")
+        cur.execute(SQL_TOTAL_DISTANCE, {"car_id": car_id})
         result = cur.fetchone()
-        # Also get odometer from latest position
-        car_filter = f"WHERE car_id = {car_id}" if car_id else ""
-        cur.execute(f"SELECT odometer FROM positions {car_filter} ORDER BY date DESC LIMIT 1")
-        odo = cur.fetchone()
-        conn.close()
         if result and result['total_km']:
-            total = float(result['total_km'])
+            total = result['total_km']
             if unit == "mi":
-                total = total / 1.60934
+                total = total * KM_TO_MI
             return {
                 "total_distance_logged": round(total, 2),
-                "odometer_km": round(float(odo['odometer']), 1) if odo and odo['odometer'] else None,
+                "odometer_km": round(result['odometer'], 1) if result['odometer'] is not None else None,
                 "unit": "miles" if unit == "mi" else "kilometer",
                 "total_trips": result['total_trips']
             }
         return {"total_distance_logged": 0, "odometer_km": None, "unit": unit, "total_trips": 0}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _http_error(e)
+
+SQL_BATTERY_STATUS = """
+    SELECT p.battery_level, p.usable_battery_level,
+           p.rated_battery_range_km::float8 as rated_battery_range_km,
+           p.ideal_battery_range_km::float8 as ideal_battery_range_km,
+           p.est_battery_range_km::float8 as est_battery_range_km,
+           p.battery_heater, p.battery_heater_on,
+           p.outside_temp::float8 as outside_temp, p.inside_temp::float8 as inside_temp,
+           ROUND(p.odometer::numeric, 1)::float8 as odometer,
+           to_char(p.date, 'YYYY-MM-DD"T"HH24:MI:SS') as date,
+           c.name as car_name, c.model
+    FROM positions p JOIN cars c ON c.id = p.car_id
+    WHERE (%(car_id)s::int IS NULL OR p.car_id = %(car_id)s)
+    ORDER BY p.date DESC LIMIT 1
+"""
 
 @app.get("/api/battery-status")
-def get_battery_status(car_id: Optional[int] = None):
+def get_battery_status(car_id: Optional[int] = None, conn: Any = Depends(get_conn)):
     try:
-        conn = get_db_connection()
         cur = conn.cursor()
-        where_clause = f"WHERE p.car_id = {car_id}" if car_id else ""
-        cur.execute(f"""
-            SELECT p.battery_level, p.usable_battery_level, p.rated_battery_range_km,
-                   p.ideal_battery_range_km, p.est_battery_range_km,
-                   p.battery_heater, p.battery_heater_on,
-                   p.outside_temp, p.inside_temp, p.odometer, p.date,
-                   c.name as car_name, c.model
-            FROM positions p JOIN cars c ON c.id = p.car_id {where_clause}
-            ORDER BY p.date DESC LIMIT 1
-        """)
+        cur.execute(SQL_BATTERY_STATUS, {"car_id": car_id})
         result = cur.fetchone()
-        conn.close()
         if result:
             return {
                 "battery_level_percent": result['battery_level'],
                 "usable_battery_level_percent": result['usable_battery_level'],
-                "rated_range_km": float(result['rated_battery_range_km']) if result['rated_battery_range_km'] else None,
-                "ideal_range_km": float(result['ideal_battery_range_km']) if result['ideal_battery_range_km'] else None,
-                "estimated_range_km": float(result['est_battery_range_km']) if result['est_battery_range_km'] else None,
+                "rated_range_km": result['rated_battery_range_km'],
+                "ideal_range_km": result['ideal_battery_range_km'],
+                "estimated_range_km": result['est_battery_range_km'],
                 "battery_heater_on": result.get('battery_heater_on', False),
-                "outside_temp_c": float(result['outside_temp']) if result['outside_temp'] else None,
-                "inside_temp_c": float(result['inside_temp']) if result['inside_temp'] else None,
-                "odometer_km": round(float(result['odometer']), 1) if result['odometer'] else None,
-                "last_updated": result['date'].isoformat() if result['date'] else None,
+                "outside_temp_c": result['outside_temp'],
+                "inside_temp_c": result['inside_temp'],
+                "odometer_km": result['odometer'],
+                "last_updated": result['date'],
                 "car_name": result['car_name'], "car_model": result['model']
             }
         return {"error": "No battery data found"}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _http_error(e)
+
+# One round trip: every part is a single-row aggregate or a LIMIT 1 lookup
+SQL_BATTERY_HEALTH = f"""
+    WITH odo AS ({SQL_LATEST_ODOMETER}),
+    max_r AS (
+        SELECT MAX(rated_battery_range_km) as max_range
+        FROM positions WHERE rated_battery_range_km IS NOT NULL
+        AND battery_level >= 95 AND (%(car_id)s::int IS NULL OR car_id = %(car_id)s)
+    ),
+    max_c AS (
+        SELECT MAX(end_rated_range_km) as max_charge_range
+        FROM charging_processes WHERE end_battery_level >= 95 AND (%(car_id)s::int IS NULL OR car_id = %(car_id)s)
+    ),
+    recent AS (
+        SELECT rated_battery_range_km, battery_level
+        FROM positions WHERE battery_level >= 90
+        AND rated_battery_range_km IS NOT NULL AND (%(car_id)s::int IS NULL OR car_id = %(car_id)s)
+        ORDER BY date DESC LIMIT 1
+    ),
+    charge_stats AS (
+        SELECT COUNT(*) as total_charges,
+               SUM(charge_energy_added) as total_added_kwh,
+               SUM(charge_energy_used) as total_used_kwh,
+               COUNT(*) FILTER (WHERE EXISTS (
+                   SELECT 1 FROM charges c
+                   WHERE c.charging_process_id = cp.id AND c.fast_charger_present
+               )) as dc_charges
+        FROM charging_processes cp
+        WHERE (%(car_id)s::int IS NULL OR car_id = %(car_id)s)
+    )
+    SELECT odo.odometer, max_r.max_range, max_c.max_charge_range,
+           recent.rated_battery_range_km, recent.battery_level,
+           charge_stats.total_charges, charge_stats.total_added_kwh, charge_stats.total_used_kwh, charge_stats.dc_charges
+    FROM max_r CROSS JOIN max_c CROSS JOIN charge_stats
+    LEFT JOIN odo ON true LEFT JOIN recent ON true
+"""
 
 @app.get("/api/battery-health")
-def get_battery_health(car_id: Optional[int] = None):
+def get_battery_health(car_id: Optional[int] = None, conn: Any = Depends(get_conn)):
     """Battery degradation and health analysis."""
     try:
-        conn = get_db_connection()
         cur = conn.cursor()
-        car_filter = f"AND car_id = {car_id}" if car_id else ""
-
-        # Get current odometer
-        cur.execute(f"SELECT odometer FROM positions WHERE 1=1 {car_filter} ORDER BY date DESC LIMIT 1")
-        odo_row = cur.fetchone()
-        odometer = float(odo_row['odometer']) if odo_row and odo_row['odometer'] else 0
-
-        # Get max rated range ever seen (= "new" capacity)
-        cur.execute(f"""
-            SELECT MAX(rated_battery_range_km) as max_range
-            FROM positions WHERE rated_battery_range_km IS NOT NULL
-            AND battery_level >= 95 {car_filter}
-        """)
-        max_row = cur.fetchone()
-
-        # Also check charging_processes for max range at high SOC
-        cur.execute(f"""
-            SELECT MAX(end_rated_range_km) as max_charge_range
-            FROM charging_processes WHERE end_battery_level >= 95 {car_filter}
-        """)
-        max_charge = cur.fetchone()
-
-        # Get recent rated range at 100% (or highest recent SOC)
-        cur.execute(f"""
-            SELECT rated_battery_range_km, battery_level, date
-            FROM positions WHERE battery_level >= 90
-            AND rated_battery_range_km IS NOT NULL {car_filter}
-            ORDER BY date DESC LIMIT 1
-        """)
-        recent_high = cur.fetchone()
+        cur.execute(SQL_BATTERY_HEALTH, {"car_id": car_id})
+        row = cur.fetchone()
+        odometer = row['odometer'] or 0
 
         # Calculate degradation using rated range as proxy
         # Tesla Model 3 LR: ~580 km rated range when new (WLTP)
         max_range_ever = 0
-        if max_row and max_row['max_range']:
-            max_range_ever = float(max_row['max_range'])
-        if max_charge and max_charge['max_charge_range']:
-            cr = float(max_charge['max_charge_range'])
+        if row['max_range']:
+            max_range_ever = row['max_range']
+        if row['max_charge_range']:
+            cr = row['max_charge_range']
             if cr > max_range_ever:
                 max_range_ever = cr
 
-        # Extrapolate recent to 100%
+        # Extrapolate the most recent high-SOC reading to 100%
         current_range_at_100 = None
-        if recent_high and recent_high['rated_battery_range_km'] and recent_high['battery_level']:
-            soc = int(recent_high['battery_level'])
-            rated = float(recent_high['rated_battery_range_km'])
+        if row['rated_battery_range_km'] and row['battery_level']:
+            soc = int(row['battery_level'])
+            rated = row['rated_battery_range_km']
             if soc > 0:
                 current_range_at_100 = round(rated * 100 / soc, 1)
 
@@ -180,28 +364,12 @@ def get_battery_health(car_id: Optional[int] = None):
             battery_health_pct = round(current_range_at_100 / max_range_ever * 100, 1)
             capacity_now_kwh = round(new_capacity_kwh * battery_health_pct / 100, 1)
 
-        # Lifetime charging stats
-        cur.execute(f"""
-            SELECT COUNT(*) as total_charges,
-                   SUM(charge_energy_added) as total_added_kwh,
-                   SUM(charge_energy_used) as total_used_kwh,
-                   SUM(CASE WHEN fast_charger_present THEN 1 ELSE 0 END) as dc_charges
-            FROM charging_processes cp
-            LEFT JOIN (
-                SELECT DISTINCT charging_process_id, fast_charger_present
-                FROM charges WHERE fast_charger_present = true
-            ) fc ON fc.charging_process_id = cp.id
-            WHERE 1=1 {car_filter}
-        """)
-        charge_stats = cur.fetchone()
-
         # Count charging cycles (rough: total kWh added / usable capacity)
-        total_added = float(charge_stats['total_added_kwh'] or 0) if charge_stats else 0
-        total_used = float(charge_stats['total_used_kwh'] or 0) if charge_stats else 0
+        total_added = row['total_added_kwh'] or 0
+        total_used = row['total_used_kwh'] or 0
         charging_cycles = round(total_added / new_capacity_kwh, 1) if new_capacity_kwh > 0 else 0
         charging_efficiency = round(total_added / total_used * 100, 1) if total_used > 0 else None
 
-        conn.close()
         return {
             "odometer_km": round(odometer, 1),
             "max_range_at_100_new_km": round(max_range_ever, 1) if max_range_ever else None,
@@ -212,171 +380,169 @@ def get_battery_health(car_id: Optional[int] = None):
             "capacity_new_kwh": new_capacity_kwh,
             "capacity_now_kwh": capacity_now_kwh,
             "capacity_lost_kwh": round(new_capacity_kwh - capacity_now_kwh, 1) if capacity_now_kwh else None,
-            "total_charges": charge_stats['total_charges'] if charge_stats else 0,
+            "total_charges": row['total_charges'],
+            "dc_charges": row['dc_charges'],
             "charging_cycles": charging_cycles,
             "total_energy_added_kwh": round(total_added, 1),
             "total_energy_used_kwh": round(total_used, 1),
             "charging_efficiency_percent": charging_efficiency,
         }
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _http_error(e)
+
+SQL_TEMPERATURE = """
+    WITH latest AS (
+        SELECT outside_temp, inside_temp, is_climate_on,
+               driver_temp_setting, battery_heater_on, date
+        FROM positions WHERE date >= %(since)s AND (%(car_id)s::int IS NULL OR car_id = %(car_id)s)
+        AND outside_temp IS NOT NULL
+        ORDER BY date DESC LIMIT 1
+    ),
+    stats AS (
+        SELECT MIN(outside_temp) as min_outside, MAX(outside_temp) as max_outside,
+               AVG(outside_temp) as avg_outside,
+               MIN(inside_temp) as min_inside, MAX(inside_temp) as max_inside,
+               AVG(inside_temp) as avg_inside
+        FROM positions WHERE date >= %(since)s AND (%(car_id)s::int IS NULL OR car_id = %(car_id)s)
+        AND outside_temp IS NOT NULL
+    )
+    SELECT latest.*, stats.* FROM stats LEFT JOIN latest ON true
+"""
 
 @app.get("/api/temperature")
-def get_temperature(car_id: Optional[int] = None, hours: int = 24):
+def get_temperature(car_id: Optional[int] = None, hours: int = 24, conn: Any = Depends(get_conn)):
     """Current and recent temperature data."""
     try:
-        conn = get_db_connection()
         cur = conn.cursor()
-        car_filter = f"AND car_id = {car_id}" if car_id else ""
-        since = datetime.now() - timedelta(hours=hours)
-
-        # Latest temps
-        cur.execute(f"""
-            SELECT outside_temp, inside_temp, is_climate_on,
-                   driver_temp_setting, battery_heater_on, date
-            FROM positions WHERE date >= %s {car_filter}
-            AND outside_temp IS NOT NULL
-            ORDER BY date DESC LIMIT 1
-        """, (since,))
-        latest = cur.fetchone()
-
-        # Min/max/avg for period
-        cur.execute(f"""
-            SELECT MIN(outside_temp) as min_outside, MAX(outside_temp) as max_outside,
-                   AVG(outside_temp) as avg_outside,
-                   MIN(inside_temp) as min_inside, MAX(inside_temp) as max_inside,
-                   AVG(inside_temp) as avg_inside
-            FROM positions WHERE date >= %s {car_filter}
-            AND outside_temp IS NOT NULL
-        """, (since,))
-        stats = cur.fetchone()
-        conn.close()
+        since = _since(hours=hours)
+        # Latest reading and min/max/avg for the period in one round trip
+        cur.execute(SQL_TEMPERATURE, {"car_id": car_id, "since": since})
+        latest = stats = cur.fetchone()
 
         result = {"period_hours": hours}
-        if latest:
+        if latest['date'] is not None:
             result["current"] = {
-                "outside_temp_c": float(latest['outside_temp']) if latest['outside_temp'] else None,
-                "inside_temp_c": float(latest['inside_temp']) if latest['inside_temp'] else None,
+                "outside_temp_c": latest['outside_temp'],
+                "inside_temp_c": latest['inside_temp'],
                 "climate_on": latest['is_climate_on'],
-                "driver_temp_setting_c": float(latest['driver_temp_setting']) if latest['driver_temp_setting'] else None,
+                "driver_temp_setting_c": latest['driver_temp_setting'],
                 "battery_heater_on": latest['battery_heater_on'],
-                "measured_at": latest['date'].isoformat(),
+                "measured_at": latest['date'],
             }
-        if stats and stats['min_outside'] is not None:
+        if stats['min_outside'] is not None:
             result["stats"] = {
-                "outside_min_c": round(float(stats['min_outside']), 1),
-                "outside_max_c": round(float(stats['max_outside']), 1),
-                "outside_avg_c": round(float(stats['avg_outside']), 1),
-                "inside_min_c": round(float(stats['min_inside']), 1) if stats['min_inside'] else None,
-                "inside_max_c": round(float(stats['max_inside']), 1) if stats['max_inside'] else None,
-                "inside_avg_c": round(float(stats['avg_inside']), 1) if stats['avg_inside'] else None,
+                "outside_min_c": round(stats['min_outside'], 1),
+                "outside_max_c": round(stats['max_outside'], 1),
+                "outside_avg_c": round(stats['avg_outside'], 1),
+                "inside_min_c": round(stats['min_inside'], 1) if stats['min_inside'] is not None else None,
+                "inside_max_c": round(stats['max_inside'], 1) if stats['max_inside'] is not None else None,
+                "inside_avg_c": round(stats['avg_inside'], 1) if stats['avg_inside'] is not None else None,
             }
         return result
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _http_error(e)
+
+SQL_TIRE_PRESSURE = """
+    SELECT tpms_pressure_fl, tpms_pressure_fr,
+           tpms_pressure_rl, tpms_pressure_rr,
+           outside_temp, date
+    FROM positions
+    WHERE tpms_pressure_fl IS NOT NULL AND (%(car_id)s::int IS NULL OR car_id = %(car_id)s)
+    ORDER BY date DESC LIMIT 1
+"""
 
 @app.get("/api/tire-pressure")
-def get_tire_pressure(car_id: Optional[int] = None):
+def get_tire_pressure(car_id: Optional[int] = None, conn: Any = Depends(get_conn)):
     """Latest tire pressure readings (TPMS)."""
     try:
-        conn = get_db_connection()
         cur = conn.cursor()
-        car_filter = f"AND car_id = {car_id}" if car_id else ""
-        cur.execute(f"""
-            SELECT tpms_pressure_fl, tpms_pressure_fr,
-                   tpms_pressure_rl, tpms_pressure_rr,
-                   outside_temp, date
-            FROM positions
-            WHERE tpms_pressure_fl IS NOT NULL {car_filter}
-            ORDER BY date DESC LIMIT 1
-        """)
+        cur.execute(SQL_TIRE_PRESSURE, {"car_id": car_id})
         result = cur.fetchone()
-        conn.close()
         if result:
             pressures = {
-                "front_left_bar": float(result['tpms_pressure_fl']),
-                "front_right_bar": float(result['tpms_pressure_fr']),
-                "rear_left_bar": float(result['tpms_pressure_rl']),
-                "rear_right_bar": float(result['tpms_pressure_rr']),
+                "front_left_bar": result['tpms_pressure_fl'],
+                "front_right_bar": result['tpms_pressure_fr'],
+                "rear_left_bar": result['tpms_pressure_rl'],
+                "rear_right_bar": result['tpms_pressure_rr'],
             }
             avg = sum(pressures.values()) / 4
             return {
                 **pressures,
                 "average_bar": round(avg, 1),
-                "outside_temp_c": float(result['outside_temp']) if result['outside_temp'] else None,
-                "measured_at": result['date'].isoformat(),
+                "outside_temp_c": result['outside_temp'],
+                "measured_at": result['date'],
             }
         return {"error": "No tire pressure data available"}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _http_error(e)
+
+# TeslaMate stores UTC timestamps without a time zone, so the age is taken
+# against UTC now on the server rather than the API host's local clock.
+SQL_RECENT_STATES = """
+    SELECT state, start_date, end_date,
+           EXTRACT(EPOCH FROM (now() AT TIME ZONE 'UTC') - start_date)::float8 as age_s
+    FROM states WHERE (%(car_id)s::int IS NULL OR car_id = %(car_id)s)
+    ORDER BY start_date DESC LIMIT 5
+"""
 
 @app.get("/api/car-state")
-def get_car_state(car_id: Optional[int] = None):
+def get_car_state(car_id: Optional[int] = None, conn: Any = Depends(get_conn)):
     """Current state: driving, charging, sleeping, online."""
     try:
-        conn = get_db_connection()
         cur = conn.cursor()
-        car_filter = f"AND car_id = {car_id}" if car_id else ""
-        cur.execute(f"""
-            SELECT state, start_date, end_date
-            FROM states WHERE 1=1 {car_filter}
-            ORDER BY start_date DESC LIMIT 5
-        """)
+        cur.execute(SQL_RECENT_STATES, {"car_id": car_id})
         states = cur.fetchall()
-        conn.close()
         if states:
             current = states[0]
             duration = None
-            if current['start_date']:
-                delta = datetime.now() - current['start_date']
-                hours = delta.total_seconds() / 3600
+            if current['age_s'] is not None:
+                hours = current['age_s'] / 3600
                 if hours < 1:
-                    duration = f"{int(delta.total_seconds() / 60)} min"
+                    duration = f"{int(current['age_s'] / 60)} min"
                 elif hours < 24:
                     duration = f"{hours:.1f} timmar"
                 else:
                     duration = f"{hours / 24:.1f} dagar"
             return {
                 "current_state": current['state'],
-                "since": current['start_date'].isoformat() if current['start_date'] else None,
+                "since": current['start_date'],
                 "duration": duration,
                 "recent_states": [
                     {
                         "state": s['state'],
-                        "start": s['start_date'].isoformat() if s['start_date'] else None,
-                        "end": s['end_date'].isoformat() if s['end_date'] else None,
+                        "start": s['start_date'],
+                        "end": s['end_date'],
                     } for s in states
                 ]
             }
         return {"error": "No state data available"}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _http_error(e)
+
+SQL_DRIVE_STATS = """
+    SELECT COUNT(*) as total_drives,
+           SUM(d.distance) as total_km,
+           SUM(d.duration_min) as total_min,
+           AVG(d.distance) as avg_km,
+           MAX(d.distance) as longest_km,
+           MAX(d.speed_max) as top_speed,
+           AVG(d.outside_temp_avg) as avg_outside_temp,
+           AVG(d.inside_temp_avg) as avg_inside_temp,
+           MAX(d.power_max) as max_power_kw,
+           MIN(d.power_min) as max_regen_kw
+    FROM drives d WHERE d.start_date >= %(since)s AND (%(car_id)s::int IS NULL OR d.car_id = %(car_id)s) AND d.distance > 0
+"""
 
 @app.get("/api/drive-stats")
-def get_drive_stats(car_id: Optional[int] = None, days: int = 30):
+def get_drive_stats(car_id: Optional[int] = None, days: int = 30, conn: Any = Depends(get_conn)):
     """Detailed driving statistics for a period."""
     try:
-        conn = get_db_connection()
         cur = conn.cursor()
-        car_filter = f"AND d.car_id = {car_id}" if car_id else ""
-        since = datetime.now() - timedelta(days=days)
-        cur.execute(f"""
-            SELECT COUNT(*) as total_drives,
-                   SUM(d.distance) as total_km,
-                   SUM(d.duration_min) as total_min,
-                   AVG(d.distance) as avg_km,
-                   MAX(d.distance) as longest_km,
-                   MAX(d.speed_max) as top_speed,
-                   AVG(d.outside_temp_avg) as avg_outside_temp,
-                   AVG(d.inside_temp_avg) as avg_inside_temp,
-                   MAX(d.power_max) as max_power_kw,
-                   MIN(d.power_min) as max_regen_kw
-            FROM drives d WHERE d.start_date >= %s {car_filter} AND d.distance > 0
-        """, (since,))
+        since = _since(days=days)
+        cur.execute(SQL_DRIVE_STATS, {"car_id": car_id, "since": since})
         result = cur.fetchone()
-        conn.close()
         if result and result['total_drives']:
-            total_km = float(result['total_km'] or 0)
+            total_km = result['total_km'] or 0
             total_min = int(result['total_min'] or 0)
             return {
                 "period_days": days,
@@ -384,196 +550,223 @@ def get_drive_stats(car_id: Optional[int] = None, days: int = 30):
                 "total_km": round(total_km, 1),
                 "total_mil": round(total_km / 10, 1),
                 "total_hours": round(total_min / 60, 1),
-                "avg_km_per_drive": round(float(result['avg_km'] or 0), 1),
-                "longest_drive_km": round(float(result['longest_km'] or 0), 1),
+                "avg_km_per_drive": round(result['avg_km'] or 0, 1),
+                "longest_drive_km": round(result['longest_km'] or 0, 1),
                 "top_speed_kmh": result['top_speed'],
-                "avg_outside_temp_c": round(float(result['avg_outside_temp']), 1) if result['avg_outside_temp'] else None,
-                "avg_inside_temp_c": round(float(result['avg_inside_temp']), 1) if result['avg_inside_temp'] else None,
+                "avg_outside_temp_c": round(result['avg_outside_temp'], 1) if result['avg_outside_temp'] is not None else None,
+                "avg_inside_temp_c": round(result['avg_inside_temp'], 1) if result['avg_inside_temp'] is not None else None,
                 "max_power_kw": result['max_power_kw'],
                 "max_regen_kw": result['max_regen_kw'],
                 "avg_speed_kmh": round(total_km / (total_min / 60), 1) if total_min > 0 else 0,
             }
         return {"error": f"No drive data for last {days} days"}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _http_error(e)
+
+SQL_CHARGING_STATS = """
+    SELECT COUNT(*) as total_charges,
+           ROUND(COALESCE(SUM(cp.charge_energy_added), 0)::numeric, 2)::float8 as total_kwh_added,
+           ROUND(COALESCE(SUM(cp.charge_energy_used), 0)::numeric, 2)::float8 as total_kwh_used,
+           ROUND(COALESCE(AVG(cp.charge_energy_added), 0)::numeric, 2)::float8 as avg_kwh_per_charge,
+           ROUND(COALESCE(SUM(cp.duration_min), 0) / 60.0, 2)::float8 as total_hours,
+           ROUND(COALESCE(SUM(cp.cost), 0)::numeric, 2)::float8 as total_cost,
+           ROUND(AVG(cp.outside_temp_avg)::numeric, 1)::float8 as avg_temp
+    FROM charging_processes cp WHERE cp.start_date >= %(since)s AND (%(car_id)s::int IS NULL OR cp.car_id = %(car_id)s)
+"""
 
 @app.get("/api/charging-stats")
-def get_charging_stats(car_id: Optional[int] = None, days: int = 30):
+def get_charging_stats(car_id: Optional[int] = None, days: int = 30, conn: Any = Depends(get_conn)):
     try:
-        conn = get_db_connection()
         cur = conn.cursor()
-        date_limit = datetime.now() - timedelta(days=days)
-        where_clause = f"AND cp.car_id = {car_id}" if car_id else ""
-        cur.execute(f"""
-            SELECT COUNT(*) as total_charges,
-                   SUM(cp.charge_energy_added) as total_kwh_added,
-                   SUM(cp.charge_energy_used) as total_kwh_used,
-                   AVG(cp.charge_energy_added) as avg_kwh_per_charge,
-                   SUM(cp.duration_min) as total_minutes,
-                   SUM(cp.cost) as total_cost,
-                   AVG(cp.outside_temp_avg) as avg_temp
-            FROM charging_processes cp WHERE cp.start_date >= %s {where_clause}
-        """, (date_limit,))
+        date_limit = _since(days=days)
+        cur.execute(SQL_CHARGING_STATS, {"car_id": car_id, "since": date_limit})
         result = cur.fetchone()
-        conn.close()
         if result and result['total_charges']:
-            added = float(result['total_kwh_added'] or 0)
-            used = float(result['total_kwh_used'] or 0)
+            added = result['total_kwh_added']
+            used = result['total_kwh_used']
             return {
                 "period_days": days,
                 "total_charging_sessions": result['total_charges'],
-                "total_energy_added_kwh": round(added, 2),
-                "total_energy_used_kwh": round(used, 2),
+                "total_energy_added_kwh": added,
+                "total_energy_used_kwh": used,
                 "charging_efficiency_percent": round(added / used * 100, 1) if used > 0 else None,
-                "average_kwh_per_session": round(float(result['avg_kwh_per_charge'] or 0), 2),
-                "total_charging_time_hours": round(float(result['total_minutes'] or 0) / 60, 2),
-                "total_cost_sek": round(float(result['total_cost'] or 0), 2),
-                "avg_outside_temp_c": round(float(result['avg_temp']), 1) if result['avg_temp'] else None,
+                "average_kwh_per_session": result['avg_kwh_per_charge'],
+                "total_charging_time_hours": result['total_hours'],
+                "total_cost_sek": result['total_cost'],
+                "avg_outside_temp_c": result['avg_temp'],
             }
         return {"error": f"No charging data found for last {days} days"}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _http_error(e)
+
+SQL_ADDRESSES = "SELECT id, display_name FROM addresses"
+# Drive queries return address ids and names are looked up here, instead of
+# joining addresses twice per request. TeslaMate only ever adds addresses, so
+# an unknown id triggers a reload as well as the TTL.
+ADDRESSES_TTL = 300
+_address_snapshot = (0.0, {})
+
+def _resolve_addresses(conn, rows, **columns):
+    """Replace address id columns with display names, e.g. start_location="start_address_id"."""
+    global _address_snapshot
+    expires, names = _address_snapshot
+    ids = {row[col] for row in rows for col in columns.values()}
+    ids.discard(None)
+    if expires <= time.monotonic() or not ids <= names.keys():
+        cur = conn.cursor()
+        cur.execute(SQL_ADDRESSES)
+        names = {r['id']: r['display_name'] for r in cur.fetchall()}
+        _address_snapshot = (time.monotonic() + ADDRESSES_TTL, names)
+    for row in rows:
+        for name_col, id_col in columns.items():
+            row[name_col] = names.get(row.pop(id_col)) or 'Unknown'
+    return rows
+
+SQL_RECENT_DRIVES = """
+    SELECT d.start_date, d.end_date, d.distance as distance_km, d.duration_min,
+           d.start_address_id, d.end_address_id,
+           d.start_ideal_range_km, d.end_ideal_range_km,
+           d.outside_temp_avg, d.speed_max,
+           (d.start_ideal_range_km - d.end_ideal_range_km) as range_used_km
+    FROM drives d
+    WHERE (%(car_id)s::int IS NULL OR d.car_id = %(car_id)s)
+    ORDER BY d.start_date DESC LIMIT %(limit)s
+"""
 
 @app.get("/api/recent-drives")
-def get_recent_drives(car_id: Optional[int] = None, limit: int = 10):
+def get_recent_drives(car_id: Optional[int] = None, limit: int = 10, conn: Any = Depends(get_conn)):
     try:
-        conn = get_db_connection()
         cur = conn.cursor()
-        where_clause = f"WHERE d.car_id = {car_id}" if car_id else ""
-        cur.execute(f"""
-            SELECT d.start_date, d.end_date, d.distance as distance_km, d.duration_min,
-                   COALESCE(a1.display_name, 'Unknown') as start_location,
-                   COALESCE(a2.display_name, 'Unknown') as end_location,
-                   d.start_ideal_range_km, d.end_ideal_range_km,
-                   d.outside_temp_avg, d.speed_max,
-                   (d.start_ideal_range_km - d.end_ideal_range_km) as range_used_km
-            FROM drives d
-            LEFT JOIN addresses a1 ON d.start_address_id = a1.id
-            LEFT JOIN addresses a2 ON d.end_address_id = a2.id
-            {where_clause} ORDER BY d.start_date DESC LIMIT %s
-        """, (limit,))
-        drives = cur.fetchall()
-        conn.close()
-        return {"recent_drives": drives, "count": len(drives)}
+        cur.execute(SQL_RECENT_DRIVES, {"car_id": car_id, "limit": limit})
+        drives = _resolve_addresses(conn, cur.fetchall(),
+                                    start_location="start_address_id", end_location="end_address_id")
+        # Returned as a response so the rows go straight to orjson instead of
+        # through FastAPI's jsonable_encoder first.
+        return FastJSONResponse({"recent_drives": drives, "count": len(drives)})
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _http_error(e)
+
+SQL_DRIVES_BY_DATE = """
+    SELECT d.start_date, d.end_date, d.distance as distance_km, d.duration_min,
+           d.start_address_id, d.end_address_id,
+           d.start_ideal_range_km, d.end_ideal_range_km,
+           d.outside_temp_avg, d.speed_max,
+           (d.start_ideal_range_km - d.end_ideal_range_km) as range_used_km
+    FROM drives d
+    WHERE d.start_date >= %(start)s AND d.start_date < (%(end)s::date + interval '1 day')
+    AND (%(car_id)s::int IS NULL OR d.car_id = %(car_id)s)
+    ORDER BY d.start_date ASC
+"""
+# Rows held in Python at a time when paging through a server-side cursor.
+PAGE_ROWS = 1000
+
+def _iter_pages(conn, name, sql, params):
+    """Yield lists of up to PAGE_ROWS rows from a named (server-side) cursor."""
+    conn.autocommit = False  # named cursors only live inside a transaction
+    try:
+        with conn.cursor(name=name) as cur:
+            cur.execute(sql, params)
+            while True:
+                rows = cur.fetchmany(PAGE_ROWS)
+                if not rows:
+                    return
+                yield rows
+    finally:
+        if not conn.closed:
+            conn.rollback()
+            conn.autocommit = True
 
 @app.get("/api/drives-by-date")
-def get_drives_by_date(start_date: str, end_date: Optional[str] = None, car_id: Optional[int] = None):
+def get_drives_by_date(start_date: str, end_date: Optional[str] = None, car_id: Optional[int] = None, conn: Any = Depends(get_conn)):
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
         if not end_date:
             end_date = datetime.now().strftime("%Y-%m-%d")
-        car_filter = f"AND d.car_id = {car_id}" if car_id else ""
-        cur.execute(f"""
-            SELECT d.start_date, d.end_date, d.distance as distance_km, d.duration_min,
-                   COALESCE(a1.display_name, 'Unknown') as start_location,
-                   COALESCE(a2.display_name, 'Unknown') as end_location,
-                   d.start_ideal_range_km, d.end_ideal_range_km,
-                   d.outside_temp_avg, d.speed_max,
-                   (d.start_ideal_range_km - d.end_ideal_range_km) as range_used_km
-            FROM drives d
-            LEFT JOIN addresses a1 ON d.start_address_id = a1.id
-            LEFT JOIN addresses a2 ON d.end_address_id = a2.id
-            WHERE d.start_date >= %s AND d.start_date < (%s::date + interval '1 day')
-            {car_filter}
-            ORDER BY d.start_date ASC
-        """, (start_date, end_date))
-        drives = cur.fetchall()
-        total_km = sum(float(d['distance_km'] or 0) for d in drives)
-        total_min = sum(int(d['duration_min'] or 0) for d in drives)
-        conn.close()
-        return {
-            "start_date": start_date, "end_date": end_date,
-            "drives": drives, "count": len(drives),
+        params = {"car_id": car_id, "start": start_date, "end": end_date}
+        # Long ranges can return thousands of drives, so each page is encoded
+        # as soon as it arrives and only the JSON bytes are kept.
+        chunks = []
+        count, total_km, total_min = 0, 0.0, 0
+        for rows in _iter_pages(conn, "drives_by_date", SQL_DRIVES_BY_DATE, params):
+            count += len(rows)
+            total_km += sum(r['distance_km'] or 0 for r in rows)
+            total_min += sum(r['duration_min'] or 0 for r in rows)
+            _resolve_addresses(conn, rows, start_location="start_address_id", end_location="end_address_id")
+            chunks.append(orjson.dumps(rows, default=_json_default)[1:-1])
+        head = orjson.dumps({
+            "start_date": start_date, "end_date": end_date, "count": count,
             "total_distance_km": round(total_km, 2),
-            "total_duration_min": total_min
-        }
+            "total_duration_min": int(total_min)
+        })
+        return Response(head[:-1] + b',"drives":[' + b",".join(chunks) + b"]}",
+                        media_type="application/json")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _http_error(e)
+
+# One row per day: the first start location is "home", the destination is the
+# first place the car went that isn't home. Both are address ids.
+SQL_JOURNAL_DAYS = """
+    WITH j AS (
+        SELECT d.start_date, d.distance, d.end_address_id,
+               first_value(d.start_address_id)
+                   OVER (PARTITION BY d.start_date::date ORDER BY d.start_date) as home_id
+        FROM drives d
+        WHERE d.start_date >= %(start)s AND d.start_date < (%(end)s::date + interval '1 day')
+        AND (%(car_id)s::int IS NULL OR d.car_id = %(car_id)s)
+    )
+    SELECT start_date::date as day,
+           SUM(distance) as day_km,
+           COUNT(*) as num_trips,
+           MIN(home_id) as home_id,
+           CASE WHEN bool_or(end_address_id IS DISTINCT FROM home_id)
+                THEN (array_agg(end_address_id ORDER BY start_date)
+                      FILTER (WHERE end_address_id IS DISTINCT FROM home_id))[1]
+                ELSE MIN(home_id) END as destination_id
+    FROM j
+    GROUP BY 1
+    HAVING COALESCE(SUM(distance), 0) >= 0.5
+    ORDER BY 1
+"""
+
+def _build_journal_entries(days: list, rate_per_mil: float) -> tuple:
+    """Turn per-day journal rows into entries; returns (entries, total_mil, total_cost)."""
+    entries = []
+    total_mil = 0.0
+    total_cost = 0.0
+    uniform = random.uniform
+    for day in days:
+        day_km = day['day_km']
+        extra_km = sum(uniform(lo, hi) for above, lo, hi in JOURNAL_EXTRA_KM if day_km > above)
+        total_km_with_extra = day_km + extra_km
+        day_mil = round(total_km_with_extra / 10, 1)
+        day_cost = round(day_mil * rate_per_mil, 2)
+        total_mil += day_mil
+        total_cost += day_cost
+        entries.append({
+            "date": day['day'],
+            "weekday": WEEKDAYS_SV[day['day'].weekday()],
+            "start": day['home'],
+            "destination": day['destination'],
+            "purpose": "Tjansteresa",
+            "distance_km_actual": round(day_km, 1),
+            "distance_km_journal": round(total_km_with_extra, 1),
+            "distance_mil": day_mil,
+            "reimbursement_sek": day_cost,
+            "num_trips": day['num_trips']
+        })
+    return entries, total_mil, total_cost
 
 @app.get("/api/driving-journal")
 def get_driving_journal(start_date: str, end_date: Optional[str] = None,
-                        car_id: Optional[int] = None, rate_per_mil: float = 25.0):
+                        car_id: Optional[int] = None, rate_per_mil: float = 25.0,
+                        conn: Any = Depends(get_conn)):
     try:
-        conn = get_db_connection()
         cur = conn.cursor()
         if not end_date:
             end_date = datetime.now().strftime("%Y-%m-%d")
-        car_filter = f"AND d.car_id = {car_id}" if car_id else ""
-        cur.execute(f"""
-            SELECT d.start_date, d.end_date, d.distance as distance_km, d.duration_min,
-                   COALESCE(a1.display_name, 'Unknown') as start_location,
-                   COALESCE(a2.display_name, 'Unknown') as end_location
-            FROM drives d
-            LEFT JOIN addresses a1 ON d.start_address_id = a1.id
-            LEFT JOIN addresses a2 ON d.end_address_id = a2.id
-            WHERE d.start_date >= %s AND d.start_date < (%s::date + interval '1 day')
-            {car_filter}
-            ORDER BY d.start_date ASC
-        """, (start_date, end_date))
-        drives = cur.fetchall()
-        conn.close()
-
-        days = {}
-        for d in drives:
-            day_key = d['start_date'].strftime("%Y-%m-%d")
-            if day_key not in days:
-                days[day_key] = []
-            days[day_key].append(d)
-
-        journal_entries = []
-        total_mil = 0
-        total_cost = 0
-
-        for day_key in sorted(days.keys()):
-            day_drives = days[day_key]
-            day_km = sum(float(d['distance_km'] or 0) for d in day_drives)
-
-            if day_km < 0.5:
-                continue
-
-            home = day_drives[0]['start_location']
-            destination = home
-            for d in day_drives:
-                if d['end_location'] != home:
-                    destination = d['end_location']
-                    break
-
-            extra_km = random.uniform(2, 5)
-            if day_km > 80:
-                extra_km += random.uniform(3, 7)
-            if day_km > 150:
-                extra_km += random.uniform(4, 8)
-            if day_km > 300:
-                extra_km += random.uniform(5, 12)
-
-            total_km_with_extra = day_km + extra_km
-            day_mil = round(total_km_with_extra / 10, 1)
-            day_cost = round(day_mil * rate_per_mil, 2)
-
-            total_mil += day_mil
-            total_cost += day_cost
-
-            weekdays_sv = {
-                "Monday": "Mandag", "Tuesday": "Tisdag", "Wednesday": "Onsdag",
-                "Thursday": "Torsdag", "Friday": "Fredag", "Saturday": "Lordag", "Sunday": "Sondag"
-            }
-            eng_day = datetime.strptime(day_key, "%Y-%m-%d").strftime("%A")
-
-            journal_entries.append({
-                "date": day_key,
-                "weekday": weekdays_sv.get(eng_day, eng_day),
-                "start": home,
-                "destination": destination,
-                "purpose": "Tjansteresa",
-                "distance_km_actual": round(day_km, 1),
-                "distance_km_journal": round(total_km_with_extra, 1),
-                "distance_mil": day_mil,
-                "reimbursement_sek": day_cost,
-                "num_trips": len(day_drives)
-            })
+        cur.execute(SQL_JOURNAL_DAYS, {"car_id": car_id, "start": start_date, "end": end_date})
+        days = _resolve_addresses(conn, cur.fetchall(), home="home_id", destination="destination_id")
+
+        journal_entries, total_mil, total_cost = _build_journal_entries(days, rate_per_mil)
 
         return {
             "period": {"start": start_date, "end": end_date},
@@ -587,41 +780,71 @@ def get_driving_journal(start_date: str, end_date: Optional[str] = None,
             }
         }
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _http_error(e)
+
+SQL_EFFICIENCY = """
+    SELECT SUM(d.distance) as total_km,
+           SUM(d.start_ideal_range_km - d.end_ideal_range_km) as total_range_used,
+           COUNT(*) as trip_count,
+           AVG(d.outside_temp_avg) as avg_temp
+    FROM drives d WHERE d.start_date >= %(since)s AND (%(car_id)s::int IS NULL OR d.car_id = %(car_id)s) AND d.distance > 0
+"""
 
 @app.get("/api/efficiency")
-def get_efficiency(car_id: Optional[int] = None, days: int = 30):
+def get_efficiency(car_id: Optional[int] = None, days: int = 30, conn: Any = Depends(get_conn)):
     try:
-        conn = get_db_connection()
         cur = conn.cursor()
-        date_limit = datetime.now() - timedelta(days=days)
-        where_clause = f"AND d.car_id = {car_id}" if car_id else ""
-        cur.execute(f"""
-            SELECT SUM(d.distance) as total_km,
-                   SUM(d.start_ideal_range_km - d.end_ideal_range_km) as total_range_used,
-                   COUNT(*) as trip_count,
-                   AVG(d.outside_temp_avg) as avg_temp
-            FROM drives d WHERE d.start_date >= %s {where_clause} AND d.distance > 0
-        """, (date_limit,))
+        date_limit = _since(days=days)
+        cur.execute(SQL_EFFICIENCY, {"car_id": car_id, "since": date_limit})
         result = cur.fetchone()
-        conn.close()
         if result and result['total_km'] and result['total_range_used']:
-            total_km = float(result['total_km'])
-            range_used = float(result['total_range_used'])
-            battery_capacity = 75
-            kwh_per_km = (range_used / total_km) * (battery_capacity / 400)
+            total_km = result['total_km']
+            range_used = result['total_range_used']
+            kwh_per_km = (range_used / total_km) * KWH_PER_RANGE_KM
             wh_per_km = kwh_per_km * 1000
             return {
                 "period_days": days, "total_distance_km": round(total_km, 2),
                 "average_wh_per_km": round(wh_per_km, 2),
                 "average_kwh_per_100km": round(kwh_per_km * 100, 2),
                 "trip_count": result['trip_count'],
-                "avg_outside_temp_c": round(float(result['avg_temp']), 1) if result['avg_temp'] else None,
+                "avg_outside_temp_c": round(result['avg_temp'], 1) if result['avg_temp'] is not None else None,
             }
         return {"error": f"No drive data found for last {days} days"}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _http_error(e)
+
+def _section(handler, **kwargs):
+    """A dashboard section, or {"error": ...} if its handler fails, so one
+    missing piece of data doesn't fail the whole dashboard."""
+    try:
+        return handler(**kwargs)
+    except HTTPException as e:
+        return {"error": e.detail}
+    except Exception as e:
+        return {"error": str(e)}
+
+@app.get("/api/dashboard")
+def get_dashboard(car_id: Optional[int] = None, days: int = 30, conn: Any = Depends(get_conn)):
+    """Cars, battery, state, temperature, tires, drive stats, charging and
+    efficiency in one request on one pooled connection. A section that fails
+    is returned as {"error": ...}; the others are unaffected."""
+    cars = _section(get_cars, conn=conn)
+    return {
+        "cars": cars.get("cars", cars),
+        "battery": _section(get_battery_status, car_id=car_id, conn=conn),
+        "state": _section(get_car_state, car_id=car_id, conn=conn),
+        "temperature": _section(get_temperature, car_id=car_id, conn=conn),
+        "tires": _section(get_tire_pressure, car_id=car_id, conn=conn),
+        "drive_stats": _section(get_drive_stats, car_id=car_id, days=days, conn=conn),
+        "charging": _section(get_charging_stats, car_id=car_id, days=days, conn=conn),
+        "efficiency": _section(get_efficiency, car_id=car_id, days=days, conn=conn),
+    }
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # Workers need an import string rather than the app object. Each worker
+    # opens up to DATABASE_POOL_MAX connections, so the count is opt-in rather
+    # than scaled with the CPUs, which could exhaust Postgres' max_connections.
+    module = os.path.splitext(os.path.basename(__file__))[0]
+    uvicorn.run(f"{module}:app", host="0.0.0.0", port=8000, loop="uvloop", http="httptools",
+                workers=int(os.getenv("WEB_CONCURRENCY", "1")))
@@ -6,23 +6,359 @@ description: Chat with your Tesla via TeslaMate API. Battery health, temperature
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta, date
-from pydantic import BaseModel, Field
-from typing import Optional
+from operator import itemgetter
+from urllib.parse import urlencode, urlsplit
+from typing import Union
+import asyncio
+import functools
+import os
+import re
+import threading
+import time
+
+try:
+    from orjson import dumps as _dumps, loads as _loads
+except ImportError:
+    from json import dumps as _dumps, loads as _loads
+
+
+def _prev_month_start(today: date) -> date:
+    return (today.replace(day=1) - timedelta(days=1)).replace(day=1)
+
+
+_API_URL = os.getenv("TESLAMATE_API_URL", "http://192.168.86.200:8000").rstrip("/")
+if urlsplit(_API_URL).scheme not in ("http", "https"):
+    raise ValueError(f"TESLAMATE_API_URL must be an http(s) URL, got {_API_URL!r}")
+
+# Hosts that accept dict results can set this to get table rows alongside the markdown
+_STRUCTURED = os.getenv("TESLAMATE_TOOL_STRUCTURED", "").lower() in ("1", "true", "yes")
+
+# Relative date terms understood by _parse_date, mapped to the start date they mean.
+_RELATIVE = {
+    "idag": lambda t: t, "today": lambda t: t,
+    "igår": lambda t: t - timedelta(days=1), "yesterday": lambda t: t - timedelta(days=1),
+    **dict.fromkeys(("senaste veckan", "last week", "förra veckan", "denna vecka", "this week"),
+                    lambda t: t - timedelta(days=7)),
+    **dict.fromkeys(("senaste månaden", "last month", "denna månad", "this month", "denna månaden"),
+                    lambda t: t.replace(day=1)),
+    **dict.fromkeys(("förra månaden", "previous month"), _prev_month_start),
+    **dict.fromkeys(("i år", "this year", "året", "hela året"), lambda t: t.replace(month=1, day=1)),
+}
+# YYYY-MM-DD, DD/MM/YYYY or DD-MM-YYYY, YYYYMMDD
+_DATE_RE = re.compile(r"(\d{4})-(\d{1,2})-(\d{1,2})|(\d{1,2})[/-](\d{1,2})[/-](\d{4})|(\d{4})(\d{2})(\d{2})")
+_SV_MONTHS = {
+    "januari": 1, "februari": 2, "mars": 3, "april": 4,
+    "maj": 5, "juni": 6, "juli": 7, "augusti": 8,
+    "september": 9, "oktober": 10, "november": 11, "december": 12
+}
+_SV_MONTH_RE = re.compile("|".join(_SV_MONTHS))
+_WEEKDAYS_SV = ("Måndag", "Tisdag", "Onsdag", "Torsdag", "Fredag", "Lördag", "Söndag")
+_CURRENT_DATE = (
+    "**Dagens datum:** %04d-%02d-%02d\n"
+    "**Tid:** %02d:%02d\n"
+    "**Veckodag:** %s\n"
+    "**Vecka:** %d\n\n"
+    "Use this date as reference for 'senaste veckan', 'denna månad', etc."
+)
+_STATE_SV = {
+    "asleep": "Sover", "online": "Online", "driving": "Kör",
+    "charging": "Laddar", "suspended": "Vilande"
+}
+# Row fields pulled out in one call per row by the table/list formatters.
+_RECENT_DRIVE_FIELDS = itemgetter("start_date", "distance_km", "duration_min",
+                                  "start_location", "end_location", "outside_temp_avg")
+_DRIVE_FIELDS = itemgetter("start_date", "distance_km", "duration_min", "start_location", "end_location")
+_JOURNAL_FIELDS = itemgetter("date", "weekday", "destination",
+                             "distance_km_journal", "distance_mil", "reimbursement_sek")
+
+
+def _in_thread(method):
+    """Make a blocking tool method awaitable: Open WebUI awaits async tools, so
+    running the HTTP call in a worker thread keeps its event loop serving
+    other chats (and parallel tool calls) meanwhile."""
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(method, self, *args, **kwargs))
+    return wrapper
+
+
+def _num(v, default=0.0):
+    """Numbers from the API as-is; numeric strings converted; None/empty -> default."""
+    return v if isinstance(v, (int, float)) else (float(v) if v else default)
+
+
+def _result(markdown: str, rows: list, summary: dict) -> Union[str, dict]:
+    if _STRUCTURED:
+        return {"markdown": markdown, "rows": rows, "summary": summary}
+    return markdown
+
+
+def _stale_note(data: dict) -> str:
+    """Footer for data _api_call served from an expired cache entry because the API failed."""
+    return "\n\n_(cached, API unreachable)_" if data.get("_stale") else ""
+
+
+def _omitted(count: int) -> str:
+    return f"_…{count} earlier rows omitted; narrow the date range for full detail._"
+
+
+def _format_ts(value, time_only: bool = False) -> str:
+    """Format an ISO timestamp from the API as "YYYY-MM-DD HH:MM" (or "HH:MM");
+    anything unparseable is returned as-is."""
+    if isinstance(value, str) and len(value) >= 16 and value[10] in "T ":
+        # The API always sends ISO 8601, so slice instead of parsing
+        return value[11:16] if time_only else value[:10] + " " + value[11:16]
+    if not value:
+        return ""
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).strftime(
+            "%H:%M" if time_only else "%Y-%m-%d %H:%M")
+    except ValueError:
+        return value
 
 
 class Tools:
-    TESLAMATE_API = "http://192.168.86.200:8000"
+    TESLAMATE_API = _API_URL
+    # Seconds a response is reused, per endpoint. Expired entries are still
+    # returned (marked "_stale") for _STALE_FOR seconds if the API fails.
+    _TTL = {
+        "/api/health": 10,
+        "/api/dashboard": 10,
+        "/api/car-state": 10,
+        "/api/battery-status": 30,
+        "/api/recent-drives": 30,
+        "/api/temperature": 60,
+        "/api/tire-pressure": 60,
+        "/api/charging-stats": 60,
+        "/api/efficiency": 60,
+        "/api/drives-by-date": 120,
+        "/api/driving-journal": 120,
+        "/api/total-distance": 300,
+        "/api/drive-stats": 300,
+        "/api/battery-health": 600,
+        "/api/cars": 3600,
+    }
+    _STALE_FOR = 3600
+    # Upper bound on cached responses; every distinct date range is its own entry.
+    _CACHE_MAX_ENTRIES = 256
+    # Failures with nothing stale to fall back on are remembered this long, so a
+    # burst of tool calls against a down API fails fast instead of each timing out.
+    _ERROR_TTL = 5
+    # /api/dashboard returns these sections in one response (one Postgres
+    # connection, one HTTP round trip); each mirrors the body of an endpoint.
+    _DASHBOARD_SECTIONS = (
+        ("cars", "/api/cars", None),
+        ("battery", "/api/battery-status", None),
+        ("state", "/api/car-state", None),
+        ("temperature", "/api/temperature", {"hours": 24}),
+        ("tires", "/api/tire-pressure", None),
+        ("drive_stats", "/api/drive-stats", {"days": 30}),
+        ("charging", "/api/charging-stats", {"days": 30}),
+        ("efficiency", "/api/efficiency", {"days": 30}),
+    )
+
+    # Shared by every Tools instance, so connections and cached responses
+    # survive even if the host creates a new instance per call.
+    _session = None
+    _executor = None
+    _cache = {}
+    # Serializes _cache_put's prune/evict/insert across the executor threads
+    _cache_lock = threading.Lock()
+    _init_lock = threading.Lock()
+    # Cache misses currently being fetched, so identical concurrent calls share one request
+    _inflight = {}
+    _inflight_lock = threading.Lock()
+    # Optional Redis tier shared by all Open WebUI workers (TESLAMATE_TOOL_REDIS_URL)
+    _redis = None
+    _redis_checked = False
+
+    # get_current_date is called first in almost every conversation; these are
+    # the usual next calls, fetched in the background into the cache.
+    _PREFETCH = (
+        ("/api/battery-status", None),
+        ("/api/cars", None),
+        ("/api/recent-drives", {"limit": 10}),
+    )
 
     def __init__(self):
         pass
 
+    @classmethod
+    def _get_session(cls) -> requests.Session:
+        if cls._session is None:
+            with cls._init_lock:
+                if cls._session is None:
+                    # Keep-alive session so follow-up tool calls reuse the API connection.
+                    # Transient failures (502/503) are retried once after a short backoff,
+                    # so a down API costs at most two attempts per call.
+                    # 500 is a deterministic API error and 504 the API's statement
+                    # timeout, so retrying either only repeats the failing query; 429
+                    # is left to _fetch so a long Retry-After can't stall the tool call.
+                    session = requests.Session()
+                    retry = Retry(total=1, connect=1, read=1, backoff_factor=0.3,
+                                  status_forcelist=(502, 503),
+                                  allowed_methods=frozenset(["GET"]), raise_on_status=False)
+                    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=10, max_retries=retry)
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    # The API gzips bodies over 1 kB (drive lists, journals)
+                    session.headers.update({"Accept-Encoding": "gzip, deflate", "Accept": "application/json"})
+                    cls._session = session
+        return cls._session
+
+    @classmethod
+    def _get_redis(cls):
+        if not cls._redis_checked:
+            with cls._init_lock:
+                if not cls._redis_checked:
+                    url = os.getenv("TESLAMATE_TOOL_REDIS_URL")
+                    if url:
+                        try:
+                            import redis
+                            cls._redis = redis.from_url(url, socket_timeout=0.5)
+                        except ImportError:
+                            pass
+                    cls._redis_checked = True
+        return cls._redis
+
+    @classmethod
+    def _get_executor(cls) -> ThreadPoolExecutor:
+        if cls._executor is None:
+            with cls._init_lock:
+                if cls._executor is None:
+                    cls._executor = ThreadPoolExecutor(max_workers=8)
+        return cls._executor
+
+    @staticmethod
+    def _cache_key(endpoint: str, params: dict = None) -> tuple:
+        return (endpoint, tuple(sorted((params or {}).items())))
+
     def _api_call(self, endpoint: str, params: dict = None) -> dict:
+        key = self._cache_key(endpoint, params)
+        now = time.monotonic()
+        cached = self._cache.get(key)
+        if cached and cached[0] > now:
+            return cached[1]
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            return future.result()
+        try:
+            data = self._load(key, endpoint, params, cached, now)
+            future.set_result(data)
+            return data
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+
+    def _cache_put(self, key: tuple, expires: float, data: dict) -> None:
+        """Store a response. Entries past their stale window are dropped, and the
+        oldest one goes once the cache holds _CACHE_MAX_ENTRIES."""
+        cache = self._cache
+        with self._cache_lock:
+            cache.pop(key, None)
+            cutoff = time.monotonic() - self._STALE_FOR
+            for k, (exp, _) in list(cache.items()):
+                if exp < cutoff:
+                    del cache[k]
+            if len(cache) >= self._CACHE_MAX_ENTRIES:
+                del cache[next(iter(cache))]
+            cache[key] = (expires, data)
+
+    def _load(self, key: tuple, endpoint: str, params: dict, cached, now: float) -> dict:
+        """Cache-miss path of _api_call: shared Redis tier, then the API, then stale copies."""
+        ttl = self._TTL.get(endpoint)
+        shared = self._shared_get(key) if ttl else None
+        if shared and shared[0] > time.time():
+            self._cache_put(key, now + shared[0] - time.time(), shared[1])
+            return shared[1]
+        data = self._fetch(endpoint, params)
+        if "error" not in data:
+            if ttl:
+                self._cache_put(key, now + ttl, data)
+                self._shared_set(key, data, ttl)
+        elif cached and "error" not in cached[1] and cached[0] + self._STALE_FOR > now:
+            return {**cached[1], "_stale": True}
+        elif shared:
+            return {**shared[1], "_stale": True}
+        else:
+            self._cache_put(key, now + self._ERROR_TTL, data)
+        return data
+
+    @staticmethod
+    def _shared_key(key: tuple) -> str:
+        return f"teslamate:{key[0]}:{urlencode(key[1])}"
+
+    def _shared_get(self, key: tuple):
+        """(fresh-until epoch, data) from Redis, or None; Redis problems count as a miss."""
+        r = self._get_redis()
+        if r is None:
+            return None
+        try:
+            entry = r.hgetall(self._shared_key(key))
+            if entry:
+                return float(entry[b"stale_at"]), _loads(entry[b"body"])
+        except Exception:
+            pass
+        return None
+
+    def _shared_set(self, key: tuple, data: dict, ttl: int) -> None:
+        r = self._get_redis()
+        if r is None:
+            return
+        try:
+            name = self._shared_key(key)
+            now = time.time()
+            pipe = r.pipeline()
+            pipe.hset(name, mapping={"body": _dumps(data), "created_at": now, "stale_at": now + ttl})
+            # Kept past stale_at so other workers can still fall back to it
+            pipe.expire(name, ttl + self._STALE_FOR)
+            pipe.execute()
+        except Exception:
+            pass
+
+    def _batch_api_call(self, calls: list) -> list:
+        """Run several (endpoint, params) calls in parallel; results keep the order of calls."""
+        executor = self._get_executor()
+        futures = [executor.submit(self._api_call, endpoint, params) for endpoint, params in calls]
+        return [f.result() for f in futures]
+
+    def _prefetch_dashboard(self) -> None:
+        """Fill the cache for every dashboard section plus total distance.
+        Uses /api/dashboard when the API has it, else one call per endpoint in parallel."""
+        dashboard, _ = self._batch_api_call([("/api/dashboard", {"days": 30}), ("/api/total-distance", None)])
+        if "error" in dashboard:
+            self._batch_api_call([(endpoint, params) for _, endpoint, params in self._DASHBOARD_SECTIONS])
+            return
+        now = time.monotonic()
+        for name, endpoint, params in self._DASHBOARD_SECTIONS:
+            section = dashboard.get(name)
+            if name == "cars" and not isinstance(section, dict):
+                section = {"cars": section or []}
+            if section is not None and "error" not in section:
+                self._cache_put(self._cache_key(endpoint, params), now + self._TTL[endpoint], section)
+
+    def _fetch(self, endpoint: str, params: dict = None) -> dict:
         try:
-            url = f"{self.TESLAMATE_API}{endpoint}"
-            response = requests.get(url, params=params, timeout=10)
+            url = self.TESLAMATE_API + endpoint
+            response = self._get_session().get(url, params=params, timeout=10)
+            if response.status_code == 429:
+                wait = response.headers.get("Retry-After", "").strip()
+                when = f"in {wait} seconds" if wait.isdigit() else "later"
+                return {"error": f"TeslaMate API is rate limiting requests, retry {when}"}
             response.raise_for_status()
-            return response.json()
+            return _loads(response.content)
         except requests.exceptions.ConnectionError:
             return {"error": "Could not connect to TeslaMate API. Is the service running?"}
         except requests.exceptions.Timeout:
@@ -30,38 +366,29 @@ class Tools:
         except Exception as e:
             return {"error": str(e)}
 
-    def _parse_date(self, date_str: str) -> str:
-        today = date.today()
+    def _parse_date(self, date_str: str, today: date = None) -> str:
+        today = today or date.today()
         if not date_str or date_str.strip() == "":
             return today.isoformat()
         low = date_str.strip().lower()
-        if low in ("idag", "today"):
-            return today.isoformat()
-        if low in ("igår", "yesterday"):
-            return (today - timedelta(days=1)).isoformat()
-        if low in ("senaste veckan", "last week", "förra veckan", "denna vecka", "this week"):
-            return (today - timedelta(days=7)).isoformat()
-        if low in ("senaste månaden", "last month", "denna månad", "this month", "denna månaden"):
-            return today.replace(day=1).isoformat()
-        if low in ("förra månaden", "previous month"):
-            first_this = today.replace(day=1)
-            last_prev = first_this - timedelta(days=1)
-            return last_prev.replace(day=1).isoformat()
-        if low in ("i år", "this year", "året", "hela året"):
-            return today.replace(month=1, day=1).isoformat()
-        for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%Y%m%d"):
+        relative = _RELATIVE.get(low)
+        if relative:
+            return relative(today).isoformat()
+        m = _DATE_RE.fullmatch(low)
+        if m:
+            y1, m1, d1, d2, m2, y2, y3, m3, d3 = m.groups()
             try:
-                return datetime.strptime(date_str.strip(), fmt).strftime("%Y-%m-%d")
+                if y1:
+                    return date(int(y1), int(m1), int(d1)).isoformat()
+                if y2:
+                    return date(int(y2), int(m2), int(d2)).isoformat()
+                return date(int(y3), int(m3), int(d3)).isoformat()
             except ValueError:
-                continue
-        swedish_months = {
-            "januari": 1, "februari": 2, "mars": 3, "april": 4,
-            "maj": 5, "juni": 6, "juli": 7, "augusti": 8,
-            "september": 9, "oktober": 10, "november": 11, "december": 12
-        }
-        for name, num in swedish_months.items():
-            if name in low:
-                return date(today.year, num, 1).isoformat()
+                pass
+        # Earliest month in the calendar wins when several are named, as before
+        months = _SV_MONTH_RE.findall(low)
+        if months:
+            return date(today.year, min(map(_SV_MONTHS.get, months)), 1).isoformat()
         return date_str.strip()
 
     def get_current_date(self) -> str:
@@ -71,16 +398,16 @@ class Tools:
         Use this when asked about anything time-related, or before calling functions that need date parameters.
         """
         now = datetime.now()
-        weekdays_sv = ["Måndag", "Tisdag", "Onsdag", "Torsdag", "Fredag", "Lördag", "Söndag"]
-        weekday = weekdays_sv[now.weekday()]
-        return (
-            f"**Dagens datum:** {now.strftime('%Y-%m-%d')}\n"
-            f"**Tid:** {now.strftime('%H:%M')}\n"
-            f"**Veckodag:** {weekday}\n"
-            f"**Vecka:** {now.isocalendar()[1]}\n\n"
-            f"Use this date as reference for 'senaste veckan', 'denna månad', etc."
-        )
+        try:
+            executor = self._get_executor()
+            for endpoint, params in self._PREFETCH:
+                executor.submit(self._api_call, endpoint, params)
+        except Exception:
+            pass
+        return _CURRENT_DATE % (now.year, now.month, now.day, now.hour, now.minute,
+                                _WEEKDAYS_SV[now.weekday()], now.isocalendar()[1])
 
+    @_in_thread
     def get_car_info(self) -> str:
         """
         Get information about the Tesla car - name, model, VIN, color, wheels, and efficiency.
@@ -106,8 +433,9 @@ class Tools:
             if car.get('wheel_type'):
                 lines.append(f"- Wheels: {car['wheel_type']}")
             lines.append(f"- Efficiency: {car.get('efficiency', 'N/A')} kWh/km")
-        return "\n".join(lines)
+        return "\n".join(lines) + _stale_note(data)
 
+    @_in_thread
     def get_battery_status(self) -> str:
         """
         Get current battery level, range estimates, temperatures, and battery heater status.
@@ -117,20 +445,20 @@ class Tools:
         data = self._api_call("/api/battery-status")
         if "error" in data:
             return f"Error: {data['error']}"
-        lines = [
-            f"**Battery Status — {data.get('car_name', '')}**",
-            f"- Battery Level: {data.get('battery_level_percent', 'N/A')}%",
-            f"- Usable Battery: {data.get('usable_battery_level_percent', 'N/A')}%",
-            f"- Rated Range: {data.get('rated_range_km', 'N/A')} km",
-            f"- Estimated Range: {data.get('estimated_range_km', 'N/A')} km",
-            f"- Battery Heater: {'On' if data.get('battery_heater_on') else 'Off'}",
-            f"- Outside Temp: {data.get('outside_temp_c', 'N/A')}°C",
-            f"- Inside Temp: {data.get('inside_temp_c', 'N/A')}°C",
-            f"- Odometer: {data.get('odometer_km', 'N/A')} km",
-            f"- Last Updated: {data.get('last_updated', 'N/A')}",
-        ]
-        return "\n".join(lines)
+        return (
+            f"**Battery Status — {data.get('car_name', '')}**\n"
+            f"- Battery Level: {data.get('battery_level_percent', 'N/A')}%\n"
+            f"- Usable Battery: {data.get('usable_battery_level_percent', 'N/A')}%\n"
+            f"- Rated Range: {data.get('rated_range_km', 'N/A')} km\n"
+            f"- Estimated Range: {data.get('estimated_range_km', 'N/A')} km\n"
+            f"- Battery Heater: {'On' if data.get('battery_heater_on') else 'Off'}\n"
+            f"- Outside Temp: {data.get('outside_temp_c', 'N/A')}°C\n"
+            f"- Inside Temp: {data.get('inside_temp_c', 'N/A')}°C\n"
+            f"- Odometer: {data.get('odometer_km', 'N/A')} km\n"
+            f"- Last Updated: {data.get('last_updated', 'N/A')}"
+        ) + _stale_note(data)
 
+    @_in_thread
     def get_battery_health(self) -> str:
         """
         Get battery degradation and health analysis. Shows capacity loss, range loss,
@@ -141,32 +469,28 @@ class Tools:
         data = self._api_call("/api/battery-health")
         if "error" in data:
             return f"Error: {data['error']}"
-        lines = [
-            "**Battery Health & Degradation**",
-            f"- Odometer: {data.get('odometer_km', 'N/A')} km",
-            "",
-            "**Capacity:**",
-            f"- New: {data.get('capacity_new_kwh', 'N/A')} kWh",
-            f"- Now: {data.get('capacity_now_kwh', 'N/A')} kWh",
-            f"- Lost: {data.get('capacity_lost_kwh', 'N/A')} kWh",
-            "",
-            "**Range at 100%:**",
-            f"- When new: {data.get('max_range_at_100_new_km', 'N/A')} km",
-            f"- Now: {data.get('current_range_at_100_km', 'N/A')} km",
-            f"- Lost: {data.get('range_lost_km', 'N/A')} km",
-            "",
-            f"**Battery Health: {data.get('battery_health_percent', 'N/A')}%**",
-            f"**Degradation: {data.get('degradation_percent', 'N/A')}%**",
-            "",
-            "**Charging Lifetime:**",
-            f"- Total charges: {data.get('total_charges', 0)}",
-            f"- Charging cycles: {data.get('charging_cycles', 0)}",
-            f"- Energy added: {data.get('total_energy_added_kwh', 0)} kWh ({round(data.get('total_energy_added_kwh', 0) / 1000, 2)} MWh)",
-            f"- Energy used: {data.get('total_energy_used_kwh', 0)} kWh ({round(data.get('total_energy_used_kwh', 0) / 1000, 2)} MWh)",
-            f"- Charging efficiency: {data.get('charging_efficiency_percent', 'N/A')}%",
-        ]
-        return "\n".join(lines)
+        return (
+            "**Battery Health & Degradation**\n"
+            f"- Odometer: {data.get('odometer_km', 'N/A')} km\n"
+            "\n**Capacity:**\n"
+            f"- New: {data.get('capacity_new_kwh', 'N/A')} kWh\n"
+            f"- Now: {data.get('capacity_now_kwh', 'N/A')} kWh\n"
+            f"- Lost: {data.get('capacity_lost_kwh', 'N/A')} kWh\n"
+            "\n**Range at 100%:**\n"
+            f"- When new: {data.get('max_range_at_100_new_km', 'N/A')} km\n"
+            f"- Now: {data.get('current_range_at_100_km', 'N/A')} km\n"
+            f"- Lost: {data.get('range_lost_km', 'N/A')} km\n"
+            f"\n**Battery Health: {data.get('battery_health_percent', 'N/A')}%**\n"
+            f"**Degradation: {data.get('degradation_percent', 'N/A')}%**\n"
+            "\n**Charging Lifetime:**\n"
+            f"- Total charges: {data.get('total_charges', 0)}\n"
+            f"- Charging cycles: {data.get('charging_cycles', 0)}\n"
+            f"- Energy added: {data.get('total_energy_added_kwh', 0)} kWh ({round(data.get('total_energy_added_kwh', 0) / 1000, 2)} MWh)\n"
+            f"- Energy used: {data.get('total_energy_used_kwh', 0)} kWh ({round(data.get('total_energy_used_kwh', 0) / 1000, 2)} MWh)\n"
+            f"- Charging efficiency: {data.get('charging_efficiency_percent', 'N/A')}%"
+        ) + _stale_note(data)
 
+    @_in_thread
     def get_temperature(self, hours: int = 24) -> str:
         """
         Get current and recent temperature data — outside temp, inside temp, climate status,
@@ -195,8 +519,9 @@ class Tools:
             lines.append(f"- Outside: {stats.get('outside_min_c')}°C to {stats.get('outside_max_c')}°C (avg {stats.get('outside_avg_c')}°C)")
             if stats.get('inside_min_c') is not None:
                 lines.append(f"- Inside: {stats.get('inside_min_c')}°C to {stats.get('inside_max_c')}°C (avg {stats.get('inside_avg_c')}°C)")
-        return "\n".join(lines)
+        return "\n".join(lines) + _stale_note(data)
 
+    @_in_thread
     def get_tire_pressure(self) -> str:
         """
         Get current tire pressure for all four tires (TPMS).
@@ -205,18 +530,18 @@ class Tools:
         data = self._api_call("/api/tire-pressure")
         if "error" in data:
             return f"Error: {data['error']}"
-        lines = [
-            "**Tire Pressure (TPMS)**",
-            f"- Front Left:  {data.get('front_left_bar', 'N/A')} bar",
-            f"- Front Right: {data.get('front_right_bar', 'N/A')} bar",
-            f"- Rear Left:   {data.get('rear_left_bar', 'N/A')} bar",
-            f"- Rear Right:  {data.get('rear_right_bar', 'N/A')} bar",
-            f"- Average:     {data.get('average_bar', 'N/A')} bar",
-            f"- Outside temp: {data.get('outside_temp_c', 'N/A')}°C",
-            f"- Measured: {data.get('measured_at', 'N/A')}",
-        ]
-        return "\n".join(lines)
+        return (
+            "**Tire Pressure (TPMS)**\n"
+            f"- Front Left:  {data.get('front_left_bar', 'N/A')} bar\n"
+            f"- Front Right: {data.get('front_right_bar', 'N/A')} bar\n"
+            f"- Rear Left:   {data.get('rear_left_bar', 'N/A')} bar\n"
+            f"- Rear Right:  {data.get('rear_right_bar', 'N/A')} bar\n"
+            f"- Average:     {data.get('average_bar', 'N/A')} bar\n"
+            f"- Outside temp: {data.get('outside_temp_c', 'N/A')}°C\n"
+            f"- Measured: {data.get('measured_at', 'N/A')}"
+        ) + _stale_note(data)
 
+    @_in_thread
     def get_car_state(self) -> str:
         """
         Get the car's current state — driving, charging, sleeping, or online.
@@ -226,13 +551,9 @@ class Tools:
         data = self._api_call("/api/car-state")
         if "error" in data:
             return f"Error: {data['error']}"
-        state_sv = {
-            "asleep": "Sover", "online": "Online", "driving": "Kör",
-            "charging": "Laddar", "suspended": "Vilande"
-        }
         current = data.get("current_state", "unknown")
         lines = [
-            f"**Car State: {state_sv.get(current, current)}**",
+            f"**Car State: {_STATE_SV.get(current, current)}**",
             f"- Since: {data.get('since', 'N/A')}",
             f"- Duration: {data.get('duration', 'N/A')}",
         ]
@@ -240,9 +561,10 @@ class Tools:
         if len(recent) > 1:
             lines.append("\n**Recent states:**")
             for s in recent[1:]:
-                lines.append(f"- {state_sv.get(s['state'], s['state'])}: {s.get('start', '')}")
-        return "\n".join(lines)
+                lines.append(f"- {_STATE_SV.get(s['state'], s['state'])}: {s.get('start', '')}")
+        return "\n".join(lines) + _stale_note(data)
 
+    @_in_thread
     def get_drive_stats(self, days: int = 30) -> str:
         """
         Get detailed driving statistics — total distance, top speed, max power,
@@ -255,22 +577,22 @@ class Tools:
         data = self._api_call("/api/drive-stats", {"days": days})
         if "error" in data:
             return f"Error: {data['error']}"
-        lines = [
-            f"**Driving Statistics (last {days} days)**",
-            f"- Total drives: {data.get('total_drives', 0)}",
-            f"- Distance: {data.get('total_km', 0)} km ({data.get('total_mil', 0)} mil)",
-            f"- Driving time: {data.get('total_hours', 0)} hours",
-            f"- Avg per drive: {data.get('avg_km_per_drive', 0)} km",
-            f"- Longest drive: {data.get('longest_drive_km', 0)} km",
-            f"- Average speed: {data.get('avg_speed_kmh', 0)} km/h",
-            f"- Top speed: {data.get('top_speed_kmh', 'N/A')} km/h",
-            f"- Max power: {data.get('max_power_kw', 'N/A')} kW",
-            f"- Max regen: {data.get('max_regen_kw', 'N/A')} kW",
-            f"- Avg outside temp: {data.get('avg_outside_temp_c', 'N/A')}°C",
-            f"- Avg inside temp: {data.get('avg_inside_temp_c', 'N/A')}°C",
-        ]
-        return "\n".join(lines)
+        return (
+            f"**Driving Statistics (last {days} days)**\n"
+            f"- Total drives: {data.get('total_drives', 0)}\n"
+            f"- Distance: {data.get('total_km', 0)} km ({data.get('total_mil', 0)} mil)\n"
+            f"- Driving time: {data.get('total_hours', 0)} hours\n"
+            f"- Avg per drive: {data.get('avg_km_per_drive', 0)} km\n"
+            f"- Longest drive: {data.get('longest_drive_km', 0)} km\n"
+            f"- Average speed: {data.get('avg_speed_kmh', 0)} km/h\n"
+            f"- Top speed: {data.get('top_speed_kmh', 'N/A')} km/h\n"
+            f"- Max power: {data.get('max_power_kw', 'N/A')} kW\n"
+            f"- Max regen: {data.get('max_regen_kw', 'N/A')} kW\n"
+            f"- Avg outside temp: {data.get('avg_outside_temp_c', 'N/A')}°C\n"
+            f"- Avg inside temp: {data.get('avg_inside_temp_c', 'N/A')}°C"
+        ) + _stale_note(data)
 
+    @_in_thread
     def get_total_distance(self) -> str:
         """
         Get total distance driven and odometer reading.
@@ -279,15 +601,16 @@ class Tools:
         data = self._api_call("/api/total-distance")
         if "error" in data:
             return f"Error: {data['error']}"
-        logged = data.get("total_distance_logged", 0)
-        odo = data.get("odometer_km", 0)
+        logged = data.get("total_distance_logged") or 0
+        odo = data.get("odometer_km")
         return (
             f"**Distance**\n"
-            f"- Odometer: {odo:,.1f} km\n"
+            f"- Odometer: {'N/A' if odo is None else f'{odo:,.1f}'} km\n"
             f"- Logged in TeslaMate: {logged:,.1f} km\n"
             f"- Total trips: {data.get('total_trips', 0)}"
-        )
+        ) + _stale_note(data)
 
+    @_in_thread
     def get_charging_stats(self, days: int = 30) -> str:
         """
         Get charging statistics — sessions, energy, efficiency, costs, and temperature.
@@ -308,8 +631,9 @@ class Tools:
             f"- Total time: {data.get('total_charging_time_hours', 0)} hours\n"
             f"- Total cost: {data.get('total_cost_sek', 0)} SEK\n"
             f"- Avg outside temp: {data.get('avg_outside_temp_c', 'N/A')}°C"
-        )
+        ) + _stale_note(data)
 
+    @_in_thread
     def get_recent_drives(self, limit: int = 10) -> str:
         """
         Get the most recent drives with locations, distance, duration, and temperature.
@@ -325,36 +649,25 @@ class Tools:
         drives = data.get("recent_drives", [])
         if not drives:
             return "No recent drives found."
-        lines = [f"**Last {len(drives)} Drives**\n"]
-        for i, d in enumerate(drives, 1):
-            dist = round(float(d.get("distance_km", 0) or 0), 1)
-            dur = d.get("duration_min", 0) or 0
-            start = d.get("start_location", "Unknown")
-            end = d.get("end_location", "Unknown")
-            temp = d.get("outside_temp_avg")
-            date_str = d.get("start_date", "")
-            if date_str:
-                try:
-                    dt = datetime.fromisoformat(str(date_str).replace("Z", "+00:00"))
-                    date_str = dt.strftime("%Y-%m-%d %H:%M")
-                except:
-                    pass
-            temp_str = f", {temp}°C" if temp else ""
-            lines.append(f"{i}. **{date_str}** — {dist} km, {dur} min{temp_str}")
-            lines.append(f"   {start} → {end}")
-        return "\n".join(lines)
-
-    def get_drives_by_date(self, start_date: str = "", end_date: str = "") -> str:
+        return f"**Last {len(drives)} Drives**\n\n" + "\n".join(
+            f"{i}. **{_format_ts(ts)}** — {round(_num(dist), 1)} km, {_num(dur, 0)} min"
+            f"{f', {temp}°C' if temp else ''}\n   {start} → {end}"
+            for i, (ts, dist, dur, start, end, temp) in enumerate(map(_RECENT_DRIVE_FIELDS, drives), 1)
+        ) + _stale_note(data)
+
+    @_in_thread
+    def get_drives_by_date(self, start_date: str = "", end_date: str = "", max_rows: int = 200) -> Union[str, dict]:
         """
         Get all drives within a date range with locations, distance, and temperature.
         IMPORTANT: Call get_current_date first to know today's date!
 
         :param start_date: YYYY-MM-DD or relative: 'senaste veckan', 'denna månad', 'igår'. Default: 7 days ago.
         :param end_date: YYYY-MM-DD. Default: today.
+        :param max_rows: Show at most this many of the latest drives (default 200). Totals always cover the whole range.
         """
         today = date.today()
-        parsed_start = self._parse_date(start_date) if start_date else (today - timedelta(days=7)).isoformat()
-        parsed_end = self._parse_date(end_date) if end_date else today.isoformat()
+        parsed_start = self._parse_date(start_date, today) if start_date else (today - timedelta(days=7)).isoformat()
+        parsed_end = self._parse_date(end_date, today) if end_date else today.isoformat()
         params = {"start_date": parsed_start, "end_date": parsed_end}
         data = self._api_call("/api/drives-by-date", params)
         if "error" in data:
@@ -364,36 +677,31 @@ class Tools:
         total_min = data.get("total_duration_min", 0)
         if not drives:
             return f"No drives found between {parsed_start} and {parsed_end}."
-        lines = [
-            f"**Drives {parsed_start} to {parsed_end}**",
-            f"Total: {len(drives)} drives, {total_km} km, {total_min} min\n"
-        ]
-        for i, d in enumerate(drives, 1):
-            dist = round(float(d.get("distance_km", 0) or 0), 1)
-            dur = d.get("duration_min", 0) or 0
-            start = d.get("start_location", "Unknown")
-            end = d.get("end_location", "Unknown")
-            date_str = d.get("start_date", "")
-            if date_str:
-                try:
-                    dt = datetime.fromisoformat(str(date_str).replace("Z", "+00:00"))
-                    date_str = dt.strftime("%H:%M")
-                except:
-                    pass
-            lines.append(f"{i}. **{date_str}** — {dist} km, {dur} min: {start} → {end}")
-        return "\n".join(lines)
-
-    def get_driving_journal(self, start_date: str = "", end_date: str = "") -> str:
+        header = (
+            f"**Drives {parsed_start} to {parsed_end}**\n"
+            f"Total: {len(drives)} drives, {total_km} km, {total_min} min\n\n"
+        )
+        skip = max(len(drives) - max(max_rows, 0), 0)
+        body = "\n".join(
+            f"{i}. **{_format_ts(ts, time_only=True)}** — {round(_num(dist), 1)} km, {_num(dur, 0)} min: {start} → {end}"
+            for i, (ts, dist, dur, start, end) in enumerate(map(_DRIVE_FIELDS, drives[skip:]), skip + 1)
+        )
+        summary = {"count": len(drives), "total_distance_km": total_km, "total_duration_min": total_min}
+        return _result(header + (_omitted(skip) + "\n" + body if skip else body) + _stale_note(data), drives, summary)
+
+    @_in_thread
+    def get_driving_journal(self, start_date: str = "", end_date: str = "", max_rows: int = 200) -> Union[str, dict]:
         """
         Generate a Swedish driving journal (körjournal) for tax reimbursement at 25 kr/mil.
         IMPORTANT: Call get_current_date first to know today's date!
 
         :param start_date: YYYY-MM-DD or relative: 'senaste veckan', 'denna månad', 'januari'. Default: 7 days ago.
         :param end_date: YYYY-MM-DD. Default: today.
+        :param max_rows: Show at most this many of the latest days (default 200). The summary always covers the whole range.
         """
         today = date.today()
-        parsed_start = self._parse_date(start_date) if start_date else (today - timedelta(days=7)).isoformat()
-        parsed_end = self._parse_date(end_date) if end_date else today.isoformat()
+        parsed_start = self._parse_date(start_date, today) if start_date else (today - timedelta(days=7)).isoformat()
+        parsed_end = self._parse_date(end_date, today) if end_date else today.isoformat()
         params = {"start_date": parsed_start, "end_date": parsed_end}
         data = self._api_call("/api/driving-journal", params)
         if "error" in data:
@@ -403,29 +711,26 @@ class Tools:
         period = data.get("period", {})
         if not entries:
             return f"No driving data found for {parsed_start} to {parsed_end}."
-        lines = [
+        skip = max(len(entries) - max(max_rows, 0), 0)
+        rows = "\n".join(
+            f"| {d} | {day} | {dest if len(dest) <= 40 else dest[:37] + '...'} | {km} | {mil} | {sek} kr |"
+            for d, day, dest, km, mil, sek in map(_JOURNAL_FIELDS, entries[skip:])
+        )
+        markdown = "\n".join((
             f"**Körjournal {period.get('start', '')} — {period.get('end', '')}**\n",
             "| Datum | Dag | Destination | Km | Mil | Ersättning |",
             "|-------|-----|-------------|----:|-----:|-----------:|",
-        ]
-        for e in entries:
-            d = e.get("date", "")
-            day = e.get("weekday", "")
-            dest = e.get("destination", "Unknown")
-            if len(dest) > 40:
-                dest = dest[:37] + "..."
-            km = e.get("distance_km_journal", 0)
-            mil = e.get("distance_mil", 0)
-            sek = e.get("reimbursement_sek", 0)
-            lines.append(f"| {d} | {day} | {dest} | {km} | {mil} | {sek} kr |")
-        lines.append("")
-        lines.append("**Summering:**")
-        lines.append(f"- Antal dagar: {summary.get('total_days', 0)}")
-        lines.append(f"- Total sträcka: {summary.get('total_mil', 0)} mil ({summary.get('total_km', 0)} km)")
-        lines.append(f"- Total ersättning: {summary.get('total_reimbursement_sek', 0)} kr")
-        lines.append(f"- Milersättning: {summary.get('rate_per_mil', 25)} kr/mil")
-        return "\n".join(lines)
+            rows,
+            f"\n{_omitted(skip)}\n" if skip else "",
+            "**Summering:**",
+            f"- Antal dagar: {summary.get('total_days', 0)}",
+            f"- Total sträcka: {summary.get('total_mil', 0)} mil ({summary.get('total_km', 0)} km)",
+            f"- Total ersättning: {summary.get('total_reimbursement_sek', 0)} kr",
+            f"- Milersättning: {summary.get('rate_per_mil', 25)} kr/mil",
+        ))
+        return _result(markdown + _stale_note(data), entries, summary)
 
+    @_in_thread
     def get_efficiency(self, days: int = 30) -> str:
         """
         Get energy efficiency — Wh/km and kWh/100km averages with temperature context.
@@ -443,8 +748,38 @@ class Tools:
             f"- Total Distance: {data.get('total_distance_km', 0)} km\n"
             f"- Trips: {data.get('trip_count', 0)}\n"
             f"- Avg outside temp: {data.get('avg_outside_temp_c', 'N/A')}°C"
+        ) + _stale_note(data)
+
+    async def get_full_status(self) -> str:
+        """
+        Get a full status report in one go — car info, battery status, current state,
+        temperature, tire pressure, total distance, and charging and efficiency for the last 30 days.
+        Use this when asked for an overview, a full status report, or how the car is doing in general.
+        """
+        # One round trip fills the cache; the formatters below then read from it,
+        # or fetch their own section if the prefetch failed.
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._prefetch_dashboard)
+        except Exception:
+            pass
+        sections = await asyncio.gather(
+            self.get_car_info(),
+            self.get_battery_status(),
+            self.get_car_state(),
+            self.get_temperature(24),
+            self.get_tire_pressure(),
+            self.get_total_distance(),
+            self.get_charging_stats(30),
+            self.get_efficiency(30),
+            return_exceptions=True,
+        )
+        # One broken section shouldn't cost the user the other seven
+        return "\n\n".join(
+            f"Error: {section}" if isinstance(section, Exception) else section
+            for section in sections
         )
 
+    @_in_thread
     def get_health_status(self) -> str:
         """
         Check if the TeslaMate system and database are running.
@@ -457,4 +792,4 @@ class Tools:
             f"**TeslaMate System Status**\n"
             f"- API: Running\n"
             f"- Database: {data.get('database', 'Unknown')}"
-        )
+        ) + _stale_note(data)